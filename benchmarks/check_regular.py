@@ -0,0 +1,207 @@
+"""
+Check the regular-interval fast path against the 1 second grid.
+
+Generates random regularly sampled series (1 to 30 minute intervals, starting
+at any second, not just on the minute) and runs each fast path kernel in
+proj/functions/regular.py and the /api/rain, /api/flow and /api/rainflow
+endpoints twice: once as-is, and once with the series forced onto the 1
+second grid. Exits with a non-zero status if any result differs.
+
+Example:
+    python benchmarks/check_regular.py --trials 100
+"""
+
+import argparse
+import os
+import sys
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import proj.utils.utils as utils  # noqa: E402
+from proj.app import app  # noqa: E402
+from proj.functions import flow, rain, regular  # noqa: E402
+
+INTERVALS = [60, 120, 300, 600, 900, 1800]
+
+get_sampling = regular.get_sampling
+
+
+def irregular_sampling(index, values=None):
+    sampling = get_sampling(index, values)
+    sampling["regular"] = False
+    return sampling
+
+
+def run_on_grid(function, *args, **kwargs):
+    # every series is treated as irregular, so it goes through the 1 second
+    # grid and the time based pandas windows
+    with mock.patch.object(utils, "get_sampling", irregular_sampling):
+        return function(*args, **kwargs)
+
+
+def same(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return bool(np.isclose(a, b, rtol=1e-9, atol=1e-9, equal_nan=True))
+    a_array, b_array = np.asarray(a), np.asarray(b)
+    if a_array.dtype.kind in "fi" and b_array.dtype.kind in "fi":
+        return a_array.shape == b_array.shape and np.allclose(
+            a_array, b_array, rtol=1e-9, atol=1e-9, equal_nan=True
+        )
+    return a_array.shape == b_array.shape and bool((a_array == b_array).all())
+
+
+def make_series(rng):
+    interval = int(rng.choice(INTERVALS))
+    n = int(rng.integers(50, 1500))
+    start = pd.Timestamp("2023-01-01") + pd.Timedelta(
+        seconds=int(rng.integers(0, 3600))
+    )
+    times = pd.date_range(start, periods=n, freq=f"{interval}s")
+    tips = rng.random(n) < rng.choice([0.01, 0.05, 0.3])
+    rain_values = np.where(tips, rng.choice([0.254, 0.5, 0.1], n), 0.0)
+    flow_values = 10 * np.abs(np.sin(np.arange(n) / 20)) + rng.random(n)
+    return times, rain_values, flow_values
+
+
+def check_kernels(times, rain_values, flow_values):
+    # returns the names of the kernels that differ
+    datetimes = times.strftime("%Y-%m-%d %H:%M:%S")
+    rain_df = pd.DataFrame({"datetime": datetimes, "rain": rain_values})
+    flow_df = pd.DataFrame({"datetime": datetimes, "flow": flow_values})
+    fast_rain = utils.format_data(rain_df.copy())
+    grid_rain = run_on_grid(utils.format_data, rain_df.copy())
+    fast_flow = utils.format_data(flow_df.copy())
+    grid_flow = run_on_grid(utils.format_data, flow_df.copy())
+    if "interval" not in fast_rain.attrs or "interval" in grid_rain.attrs:
+        return ["format_data"]
+
+    mismatches = []
+
+    def compare(name, fast, grid):
+        if not same(fast, grid):
+            mismatches.append(name)
+
+    fast_first, grid_first = rain.get_first_rain(fast_rain), rain.get_first_rain(grid_rain)
+    compare("get_first_rain", fast_first, grid_first)
+    fast_last = rain.get_last_rain(fast_rain, fast_first)
+    grid_last = rain.get_last_rain(grid_rain, grid_first)
+    compare("get_last_rain", fast_last, grid_last)
+    if not mismatches:
+        compare(
+            "get_total_rainfall",
+            rain.get_total_rainfall(fast_rain, fast_first, fast_last),
+            rain.get_total_rainfall(grid_rain, grid_first, grid_last),
+        )
+        for minute_window in (5, 10, 60):
+            compare(
+                f"get_peak_rainfall_intensity({minute_window})",
+                rain.get_peak_rainfall_intensity(
+                    fast_rain, fast_first, fast_last, minute_window
+                ),
+                rain.get_peak_rainfall_intensity(
+                    grid_rain, grid_first, grid_last, minute_window
+                ),
+            )
+
+    # flow statistics on the whole series, and on a slice like /api/rainflow
+    # takes for each rain event
+    start = times[len(times) // 4]
+    end = times[len(times) // 2] + pd.Timedelta(seconds=7)
+    for label, fast, grid in (
+        ("", fast_flow, grid_flow),
+        (" slice", fast_flow[start:end], grid_flow[start:end]),
+    ):
+        for unit in ("L/s", "gal/min", None):
+            compare(
+                f"get_runoff_volume({unit}){label}",
+                flow.get_runoff_volume(fast, unit),
+                flow.get_runoff_volume(grid, unit),
+            )
+        compare(
+            f"get_peak_flow_rate{label}",
+            flow.get_peak_flow_rate(fast),
+            flow.get_peak_flow_rate(grid),
+        )
+        compare(
+            f"get_runoff_duration{label}",
+            flow.get_runoff_duration(fast),
+            flow.get_runoff_duration(grid),
+        )
+    compare(
+        "get_time_range",
+        [x.isoformat() for x in flow.get_time_range(fast_flow)],
+        [x.isoformat() for x in flow.get_time_range(grid_flow)],
+    )
+
+    return mismatches
+
+
+def without_sampling(body):
+    if isinstance(body, dict):
+        return {k: without_sampling(v) for k, v in body.items() if k != "sampling"}
+    return body
+
+
+def check_endpoints(times, rain_values, flow_values):
+    # the full responses, apart from the sampling description. requests
+    # that fail (e.g. rain data without any events) have to fail on both
+    datetimes = list(times.strftime("%Y-%m-%d %H:%M:%S"))
+    rain_data = {"datetime": datetimes, "rain": rain_values.tolist()}
+    flow_data = {
+        "datetime": datetimes,
+        "flow": flow_values.tolist(),
+        "time_unit": "L/s",
+    }
+    payloads = {
+        "/api/rain": {"rain": rain_data},
+        "/api/flow": {"inflow1": flow_data},
+        "/api/rainflow": {"rain": rain_data, "inflow1": flow_data},
+    }
+    client = app.test_client()
+    mismatches = []
+    for path, payload in payloads.items():
+        fast = client.post(path, json=payload)
+        grid = run_on_grid(client.post, path, json=payload)
+        if fast.status_code != grid.status_code:
+            mismatches.append(f"{path} status {fast.status_code}/{grid.status_code}")
+        elif fast.status_code == 200 and not same(
+            without_sampling(fast.get_json()), without_sampling(grid.get_json())
+        ):
+            mismatches.append(path)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--trials", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    failed = 0
+    for trial in range(args.trials):
+        times, rain_values, flow_values = make_series(rng)
+        mismatches = check_kernels(times, rain_values, flow_values)
+        mismatches += check_endpoints(times, rain_values, flow_values)
+        if mismatches:
+            failed += 1
+            print(
+                f"FAIL trial {trial} (start {times[0]}, interval "
+                f"{int((times[1] - times[0]).total_seconds())} s, "
+                f"{len(times)} samples): {', '.join(mismatches)}"
+            )
+    print(f"{args.trials - failed}/{args.trials} trials match the 1 second grid")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""
+End-to-end load test for the API.
+
+Starts the app under a WSGI server (gunicorn if it's installed, otherwise
+werkzeug's threaded server), replays generated payloads of different sizes
+against the API endpoints at a given concurrency, and reports throughput,
+latency percentiles and the peak RSS of the server processes.
+
+Results can be saved as a baseline, and later runs compared against it. The
+script exits with a non-zero status if any request fails, or if p95 latency
+or throughput regress by more than the threshold. A baseline is not saved if
+any request failed.
+
+Example:
+    python benchmarks/load_test.py --concurrency 8 --save-baseline
+    python benchmarks/load_test.py --concurrency 8 --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+# number of samples in each generated series
+SIZES = {"small": 500, "medium": 5000, "large": 50000}
+# the infiltration fit is much more expensive per sample than the rest
+INFILTRATION_SIZES = {"small": 300, "medium": 1000, "large": 3000}
+ENDPOINTS = ["rain", "flow", "rainflow", "infiltration"]
+
+
+def make_times(n, minutes):
+    times = pd.date_range("2023-01-01", periods=n, freq=f"{minutes}min")
+    return [x.strftime("%Y-%m-%d %H:%M:%S") for x in times]
+
+
+def make_rain(n, rng):
+    # a storm of a few hours roughly every 3 days, 5 minute tipping bucket data
+    storm = (np.arange(n) % 864) < 36
+    tips = storm & (rng.random(n) < 0.5)
+    return {"datetime": make_times(n, 5), "rain": (tips * 0.254).round(3).tolist()}
+
+
+def make_flow(n, rng, scale=1.0):
+    t = np.arange(n)
+    hydrograph = np.exp(-(((t % 864) - 60) ** 2) / 800)
+    flow = scale * (20 * hydrograph + rng.random(n))
+    return {
+        "datetime": make_times(n, 5),
+        "flow": flow.round(3).tolist(),
+        "time_unit": "L/s",
+    }
+
+
+def make_piezometers(n, rng):
+    t = np.arange(n) * 300.0
+    data = pd.DataFrame(
+        {
+            "datetime": make_times(n, 5),
+            "PZ1": 50 * np.exp(-t / 40000) + 2 + rng.normal(0, 0.05, n),
+            "PZ2": 40 * np.exp(-t / 60000) + 1 + rng.normal(0, 0.05, n),
+        }
+    )
+    return data.round(3).to_dict(orient="records")
+
+
+def make_payload(endpoint, size, seed=0):
+    rng = np.random.default_rng(seed)
+    if endpoint == "infiltration":
+        return {
+            "data": make_piezometers(INFILTRATION_SIZES[size], rng),
+            "SMOOTHING_WINDOW": 15,
+            "REGRESSION_WINDOW": 720,
+            "REGRESSION_THRESHOLD": 0.99,
+        }
+
+    n = SIZES[size]
+    if endpoint == "rain":
+        return {"rain": make_rain(n, rng)}
+    flows = {"inflow1": make_flow(n, rng), "outflow": make_flow(n, rng, scale=0.6)}
+    if endpoint == "flow":
+        return flows
+    return {"rain": make_rain(n, rng), **flows}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, port, workers):
+    if server == "gunicorn":
+        cmd = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--workers",
+            str(workers),
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--timeout",
+            "600",
+            "proj.app:app",
+        ]
+    else:
+        cmd = [
+            sys.executable,
+            "-c",
+            "from werkzeug.serving import run_simple; from proj.app import app; "
+            f"run_simple('127.0.0.1', {port}, app, threaded=True)",
+        ]
+    # the app prints a lot while processing requests, which would skew results
+    # if it had to go to a terminal
+    process = subprocess.Popen(
+        cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{server} exited with status {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{server} did not start listening on port {port}")
+
+
+def process_tree(pid):
+    # the server pid and all of its descendants (the gunicorn workers), read from
+    # /proc so no extra dependency is needed. linux only
+    pids = [pid]
+    for child in pids:
+        try:
+            for task in os.listdir(f"/proc/{child}/task"):
+                with open(f"/proc/{child}/task/{task}/children") as f:
+                    pids.extend(int(x) for x in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def rss_mb(pid):
+    total = 0
+    for child in process_tree(pid):
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, rss_mb(self.pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_case(port, pid, endpoint, size, requests, concurrency):
+    url = f"http://127.0.0.1:{port}/api/{endpoint}"
+    body = json.dumps(make_payload(endpoint, size)).encode()
+
+    # one untimed request so first-use costs don't land in the percentiles
+    post(url, body)
+
+    sampler = RssSampler(pid)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: post(url, body), range(requests)))
+    elapsed = time.perf_counter() - start
+    peak_rss = sampler.stop()
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(not ok for _, ok in results)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "payload_kb": round(len(body) / 1024, 1),
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(p50, 1),
+        "p95_ms": round(p95, 1),
+        "p99_ms": round(p99, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    # a case regresses if p95 latency grows, or throughput drops, by more than
+    # the threshold relative to the baseline
+    failures = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        base = baseline[case]
+        if result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            failures.append(
+                f"{case}: p95 {result['p95_ms']} ms vs baseline {base['p95_ms']} ms"
+            )
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            failures.append(
+                f"{case}: throughput {result['throughput_rps']} req/s"
+                f" vs baseline {base['throughput_rps']} req/s"
+            )
+    return failures
+
+
+def print_results(results):
+    columns = [
+        "payload_kb",
+        "errors",
+        "throughput_rps",
+        "p50_ms",
+        "p95_ms",
+        "p99_ms",
+        "peak_rss_mb",
+    ]
+    print(pd.DataFrame.from_dict(results, orient="index")[columns].to_string())
+
+
+def default_server():
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return "werkzeug"
+    return "gunicorn"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--server", choices=["gunicorn", "werkzeug"], default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="per case")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed regression relative to the baseline, e.g. 0.2 for 20%%",
+    )
+    args = parser.parse_args()
+    server = args.server or default_server()
+
+    port = free_port()
+    process = start_server(server, port, args.workers)
+    print(f"Started {server} on port {port}, idle RSS {rss_mb(process.pid):.1f} MB")
+
+    results = {}
+    try:
+        for endpoint in args.endpoints:
+            for size in args.sizes:
+                case = f"{endpoint}/{size}"
+                print(f"Running {case}...", flush=True)
+                results[case] = run_case(
+                    port, process.pid, endpoint, size, args.requests, args.concurrency
+                )
+    finally:
+        process.terminate()
+        process.wait()
+
+    print_results(results)
+
+    # failed requests are checked for every case, with or without a baseline
+    errors = [
+        f"{case}: {result['errors']} failed requests"
+        for case, result in results.items()
+        if result["errors"]
+    ]
+    for error in errors:
+        print(f"ERROR {error}")
+
+    if args.save_baseline:
+        if errors:
+            print("Not saving a baseline with failed requests")
+            return 1
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 1 if errors else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = compare(results, baseline, args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if errors or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Measure how long a fresh worker takes to import the app.
+
+Imports proj.app in a new interpreter several times and reports the median
+import time, and checks that scipy is not imported at startup (it's only
+loaded by the first /api/infiltration request). Exits with a non-zero status
+if the median exceeds the budget, if scipy was imported, or if any of the
+pre-fork warm-up requests failed.
+
+Example:
+    python benchmarks/startup.py --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import proj.app
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_ms": elapsed * 1000, "scipy": "scipy" in sys.modules}))
+"""
+
+WARMUP = """
+import json
+import proj.app
+from proj.warmup import warm_up
+elapsed, failed = warm_up(proj.app.app)
+print(json.dumps({"warmup_ms": elapsed * 1000, "warmup_failed": failed}))
+"""
+
+
+def run(code):
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    args = parser.parse_args()
+
+    # the first run also pays for reading modules from disk and writing
+    # bytecode caches, which a deployed container has already done
+    run(MEASURE)
+    runs = [run(MEASURE) for _ in range(args.runs)]
+    import_ms = statistics.median(x["import_ms"] for x in runs)
+    scipy_imported = any(x["scipy"] for x in runs)
+    warmup = run(WARMUP)
+    warmup_ms = warmup["warmup_ms"]
+
+    print(f"Import proj.app: {import_ms:.0f} ms (median of {args.runs})")
+    print(f"Budget: {args.budget_ms:.0f} ms")
+    print(f"scipy imported at startup: {scipy_imported}")
+    print(f"Pre-fork warm-up: {warmup_ms:.0f} ms")
+
+    failed = False
+    if import_ms > args.budget_ms:
+        print("FAIL import time is over budget")
+        failed = True
+    if scipy_imported:
+        print("FAIL scipy should only be imported on first use")
+        failed = True
+    for path, status in warmup["warmup_failed"].items():
+        print(f"FAIL warm-up request to {path} returned {status}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+# gunicorn config that loads and warms up the app once in the parent process
+# before forking the workers, so workers start instantly and share the loaded
+# modules copy-on-write. usage:
+#   gunicorn -c gunicorn_prefork.py proj.app:app
+
+import os
+
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def on_starting(server):
+    # with preload_app the app has already been imported at this point
+    from proj.warmup import warm_up
+
+    elapsed, failed = warm_up(server.app.wsgi())
+    for path, status in failed.items():
+        server.log.warning(f"Warm-up request to {path} failed: {status}")
+    server.log.info(f"Warm-up finished in {elapsed:.2f} s")
@@ -1,9 +1,31 @@
 from flask import Flask
-from flask import request, render_template, jsonify
+from flask import request, render_template, jsonify, g, stream_with_context
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
 import os
 import pandas as pd
 import numpy as np
-from .utils.utils import load_data, format_data, format_statistics
+from .utils.utils import (
+    load_data,
+    load_piezometer_data,
+    format_data,
+    format_piezometer_data,
+    format_statistics,
+    parameter_grid,
+)
+from .utils.compression import decode_request_body, compress_response
+from .utils.profiling import profiling_requested, RequestProfiler
+from .utils.store import (
+    store_enabled,
+    append_site_data,
+    describe_site,
+)
+from .functions.regular import get_sampling
+from .utils.downsample import (
+    downsample_frame,
+    downsample_indices,
+    lttb_indices,
+    time_to_numeric,
+)
 from .functions.rain import (
     get_first_rain,
     get_last_rain,
@@ -17,13 +39,9 @@ from .functions.flow import (
     get_runoff_volume,
     get_peak_flow_rate,
     get_runoff_duration,
+    get_time_range,
     get_percent_change,
 )
-from .functions.infiltration import (
-    smooth_timeseries,
-    fit_exponential_decay,
-    exponential_decay,
-)
 
 
 app = Flask(__name__)
@@ -40,6 +58,67 @@ valid_keys = {
 
 bmp_drain_interval = 12
 
+# rows per record when streaming the infiltration data
+DATAFRAME_CHUNK_ROWS = 5000
+
+
+@app.before_request
+def decode_request():
+    # accept gzip (or zstd, if installed) compressed request bodies
+    decode_request_body(request.environ, request.max_content_length)
+
+
+@app.after_request
+def compress(response):
+    return compress_response(request, response)
+
+
+@app.errorhandler(BadRequest)
+@app.errorhandler(UnsupportedMediaType)
+@app.errorhandler(RequestEntityTooLarge)
+def handle_http_error(err):
+    # request bodies that can't be read (bad json, a compressed body that
+    # doesn't decode, unknown Content-Encoding, too large) get a json error
+    # like the rest of the api, instead of werkzeug's html page
+    return jsonify({"error": err.description}), err.code
+
+
+@app.before_request
+def start_profiling():
+    # opt in per request, see utils/profiling.py. this check is all it costs
+    # when profiling isn't requested
+    if profiling_requested(request):
+        # streamed results are computed after the view returns, when the
+        # profile has already been taken, so the two can't be combined
+        if streaming_requested(request):
+            return jsonify({"error": "profile=1 can't be combined with stream=1"}), 400
+        g.profiler = RequestProfiler()
+        g.profiler.start()
+
+
+@app.after_request
+def attach_profile(response):
+    # runs before compress, so the summary is added to the uncompressed body
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.stop()
+    summary = profiler.summary(request.endpoint)
+    body = response.get_json(silent=True) if not response.is_streamed else None
+    if isinstance(body, dict):
+        body["profile"] = summary
+        response.set_data(app.json.dumps(body))
+    return response
+
+
+@app.teardown_request
+def stop_profiling(exc):
+    # make sure the profiler is stopped (and the lock released) if the request
+    # failed before attach_profile ran
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+
 
 @app.route("/", methods=["GET"])
 def main():
@@ -51,6 +130,30 @@ def get_docs():
     return render_template("swaggerui.html")
 
 
+@app.route("/api/sites/<site_id>/data", methods=["POST"])
+def upload_site_data(site_id):
+    # append series to the local store, so later requests can refer to them
+    # by site_id instead of uploading them again
+    if not store_enabled():
+        return jsonify({"error": "Data store is not configured"}), 404
+    try:
+        counts = append_site_data(site_id, request.get_json(), valid_keys)
+    except (ValueError, TypeError) as err:
+        print(err)
+        return jsonify({"error": str(err)}), 400
+    return jsonify({"site_id": site_id, "appended": counts})
+
+
+@app.route("/api/sites/<site_id>", methods=["GET"])
+def get_site(site_id):
+    if not store_enabled():
+        return jsonify({"error": "Data store is not configured"}), 404
+    series = describe_site(site_id)
+    if not series:
+        return jsonify({"error": f"No data stored for site {site_id}"}), 404
+    return jsonify({"site_id": site_id, "series": series})
+
+
 @app.route("/api/rain", methods=["POST"])
 def rain():
     # TODO check request.args for date or parameter filtering?
@@ -109,6 +212,8 @@ def rain():
 
     body = {
         "statistics": statistics,
+        # how the data was sampled, regular data takes a faster path
+        "sampling": {"rain": formatted_rain_data.attrs["sampling"]},
     }
 
     return jsonify(body)
@@ -143,6 +248,7 @@ def flow():
 
     statistics = {}
     for data_type, series in formatted_data.items():
+        start_time, end_time = get_time_range(series)
         df = pd.DataFrame(
             {
                 "runoff_volume": [
@@ -151,10 +257,10 @@ def flow():
                 "runoff_duration": [get_runoff_duration(series)],
                 "peak_flow_rate": [get_peak_flow_rate(series)],
                 "start_time": [
-                    np.datetime_as_string(series.index.to_numpy()[0], unit="s")
+                    np.datetime_as_string(start_time.to_datetime64(), unit="s")
                 ],
                 "end_time": [
-                    np.datetime_as_string(series.index.to_numpy()[-1], unit="s")
+                    np.datetime_as_string(end_time.to_datetime64(), unit="s")
                 ],
             }
         )
@@ -187,29 +293,44 @@ def flow():
             bypass_value=statistics["bypass"]["runoff_volume"],
         )
 
-    body = {"statistics": statistics}
+    body = {
+        "statistics": statistics,
+        "sampling": {x: series.attrs["sampling"] for x, series in formatted_data.items()},
+    }
     print("body for flow api")
     print(body)
 
     return jsonify(body)
 
 
-@app.route("/api/rainflow", methods=["POST"])
-def rainflow():
-    try:
-        data = load_data(request, valid_keys)
-    except ValueError as err:
-        print(err)
-        response = app.response_class(
-            response="Invalid data format", status=400, mimetype="application/json"
-        )
-        return response
+def streaming_requested(request):
+    # /api/rainflow and /api/infiltration can send their results as
+    # newline-delimited json, one record at a time as each is computed
+    return request.args.get("stream") == "1"
 
-    formatted_data = {}
-    for data_type, df in data.items():
-        formatted_data[data_type] = format_data(df)
 
-    formatted_rain_data = formatted_data["rain"]
+def ndjson_response(records):
+    # the generator runs after the view has returned, so errors can't change
+    # the status code anymore and are sent as a final error record instead
+    def generate():
+        try:
+            for record in records:
+                yield app.json.dumps(record) + "\n"
+        except Exception as e:
+            print(e)
+            yield app.json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+    return app.response_class(
+        stream_with_context(generate()), mimetype="application/x-ndjson"
+    )
+
+
+def rainflow_statistics(data):
+    # yields (name, statistics) for the rain events, then for each flow series
+    # during those events, then the percent changes between flow series, so the
+    # results can be streamed as each series is finished
+    formatted_rain_data = format_data(data["rain"])
+    sampling = {"rain": formatted_rain_data.attrs["sampling"]}
 
     first_rain = get_first_rain(formatted_rain_data, hour_window=bmp_drain_interval)
     last_rain = get_last_rain(
@@ -243,20 +364,30 @@ def rainflow():
 
     statistics = {}
     statistics["rain"] = format_statistics(rain_df)
+    yield "rain", statistics["rain"]
 
     rain_df["last_rain_plus_interval"] = pd.to_datetime(
         rain_df["last_rain"]
     ) + pd.Timedelta(bmp_drain_interval, unit="hours")
 
     valid_flow_keys = {x for x in valid_keys if "flow" in valid_keys[x]}
-    flow_keys_in_data = valid_flow_keys.intersection(set(formatted_data.keys()))
-    formatted_flow_data = {x: formatted_data[x] for x in flow_keys_in_data}
+    flow_keys_in_data = valid_flow_keys.intersection(set(data.keys()))
 
+    # rain data has no time_unit, only the flow data does
     time_units = {}
-    for data_type, data_dict in data.items():
-        time_units[data_type] = data_dict.pop("time_unit")
+    for data_type in flow_keys_in_data:
+        time_units[data_type] = data[data_type].pop("time_unit")
+
+        if not isinstance(time_units[data_type], str):
+            time_unit_list = list(set(time_units[data_type]))
+            if time_unit_list:
+                time_units[data_type] = time_unit_list[0]
+            else:
+                time_units[data_type] = None
 
-    for data_type, series in formatted_flow_data.items():
+    for data_type in flow_keys_in_data:
+        series = format_data(data[data_type])
+        sampling[data_type] = series.attrs["sampling"]
         flow_df = pd.DataFrame(
             {
                 "runoff_volume": rain_df.apply(
@@ -281,46 +412,236 @@ def rainflow():
             }
         )
         statistics[data_type] = format_statistics(flow_df)
+        yield data_type, statistics[data_type]
 
     if flow_keys_in_data == {"inflow1", "outflow"}:
-        statistics["percent_change_volume"] = get_percent_change(
+        yield "percent_change_volume", get_percent_change(
             inflow1_value=statistics["inflow1"]["runoff_volume"],
             outflow_value=statistics["outflow"]["runoff_volume"],
         )
-        statistics["percent_change_flow_rate"] = get_percent_change(
+        yield "percent_change_flow_rate", get_percent_change(
             inflow1_value=statistics["inflow1"]["peak_flow_rate"],
             outflow_value=statistics["outflow"]["peak_flow_rate"],
         )
 
     elif flow_keys_in_data == {"inflow1", "outflow", "bypass"}:
-        statistics["percent_change_volume"] = get_percent_change(
+        yield "percent_change_volume", get_percent_change(
             inflow1_value=statistics["inflow1"]["runoff_volume"],
             outflow_value=statistics["outflow"]["runoff_volume"],
             bypass_value=statistics["bypass"]["runoff_volume"],
         )
 
     elif flow_keys_in_data == {"inflow1", "inflow2", "bypass", "outflow"}:
-        statistics["percent_change_volume"] = get_percent_change(
+        yield "percent_change_volume", get_percent_change(
             inflow1_value=statistics["inflow1"]["runoff_volume"],
             inflow2_value=statistics["inflow2"]["runoff_volume"],
             outflow_value=statistics["outflow"]["runoff_volume"],
             bypass_value=statistics["bypass"]["runoff_volume"],
         )
 
-    body = {"statistics": statistics}
+    yield "sampling", sampling
+
+
+@app.route("/api/rainflow", methods=["POST"])
+def rainflow():
+    try:
+        data = load_data(request, valid_keys)
+    except ValueError as err:
+        print(err)
+        response = app.response_class(
+            response="Invalid data format", status=400, mimetype="application/json"
+        )
+        return response
+
+    if streaming_requested(request):
+        # one record per series as soon as it's done, the percent changes
+        # and sampling come in the summary at the end
+        def records():
+            summary = {"type": "summary", "statistics": {}}
+            for name, statistics in rainflow_statistics(data):
+                if name in valid_keys:
+                    yield {
+                        "type": "statistics",
+                        "name": name,
+                        "statistics": statistics,
+                    }
+                elif name == "sampling":
+                    summary["sampling"] = statistics
+                else:
+                    summary["statistics"][name] = statistics
+            yield summary
+
+        return ndjson_response(records())
+
+    statistics = dict(rainflow_statistics(data))
+    sampling = statistics.pop("sampling")
+
+    body = {
+        "statistics": statistics,
+        "sampling": sampling,
+    }
     return jsonify(body)
 
 
+def piezometer_results(
+    df, smoothing_window, regression_window, regression_threshold, max_points=None
+):
+    # fits each piezometer column of df in turn and yields its results as soon
+    # as it's done. the smoothed series are added to df as new columns
+
+    # imported on first use rather than at startup, scipy takes longer to import
+    # than everything else combined and only this endpoint needs it
+    from .functions.infiltration import (
+        smooth_timeseries,
+        fit_exponential_decay,
+        exponential_decay,
+        get_infiltration_rate,
+    )
+
+    # Dynamically determine which columns to process (all except 'datetime')
+    piezometer_cols = [col for col in df.columns]
+
+    for piez in piezometer_cols:
+        result = {
+            "piezometer": piez,
+            "best_window": None,
+            "best_params": None,
+            "best_r_squared": None,
+            "calc_results": None,
+            "sampling": get_sampling(df.index, df[piez].to_numpy()),
+        }
+
+        # Create a smoothed column name that replaces spaces with underscores
+        smoothed_col = f"smooth_{piez.replace(' ', '_')}"
+        df[smoothed_col], mean_delta_t = smooth_timeseries(df[piez], smoothing_window)
+        print("delta t bar before round")
+        print(mean_delta_t)
+        mean_delta_t = round(mean_delta_t)
+        print("delta t bar after round")
+        print(mean_delta_t)
+        print("initial window size")
+        print(int(round(regression_window / mean_delta_t)))
+
+        # Fit the exponential decay model using the provided regression window size
+        best_window, best_params, best_fit, best_r_squared, window_size = fit_exponential_decay(
+            pd.Series(df.index), 
+            df[smoothed_col], 
+            mean_delta_t, # round delta t bar 
+            int(round(regression_window / mean_delta_t)),
+            regression_threshold
+        )
+
+        if best_window:
+            result["best_window"] = convert_best_window(best_window, max_points)
+            result["best_params"] = (
+                best_params.tolist() if best_params is not None else None
+            )
+            result["best_r_squared"] = best_r_squared
+
+            # Identify the best window start and end times
+            window_start = best_window[0][0]
+            window_end = best_window[0][-1]
+
+            # Calculate infiltration rate parameters
+            infiltration_rate, delta_x, y_average = get_infiltration_rate(
+                df[smoothed_col], best_window, best_params
+            )
+            print("raw duration" + str(delta_x))
+            print(f"Best window for {piez}: {window_start} - {window_end}")
+            print(
+                f"Average infiltration rate during the best window for {piez}: {infiltration_rate:.2f} cm/hr"
+            )
+            print(f"Duration of the best window for {piez}: {delta_x:.0f} hrs")
+            print(
+                f"Average depth during the best window for {piez}: {y_average:.2f} cm"
+            )
+
+            # Compute extended time series and best fit line for plotting
+            buffer_time = 0  # pd.Timedelta(minutes=720)
+            extended_time = pd.date_range(
+                start=window_start - buffer_time,
+                end=window_end + buffer_time,
+                freq="T",
+            )
+            extended_time_numeric = (
+                (extended_time - window_start).total_seconds().to_numpy()
+            )
+            best_fit_line = exponential_decay(extended_time_numeric, *best_params)
+            if max_points is not None:
+                # NaN/inf are sent as -88, downsample the line as it will be
+                # sent so those points aren't dropped
+                keep = lttb_indices(
+                    extended_time_numeric,
+                    np.where(np.isfinite(best_fit_line), best_fit_line, -88),
+                    max_points,
+                )
+                extended_time = extended_time[keep]
+                best_fit_line = best_fit_line[keep]
+
+            # Store computed values for this piezometer
+            result["calc_results"] = {
+                "extended_time": [pd.Timestamp(x) for x in extended_time],
+                "best_fit_line": [
+                    -88 if np.isnan(val) or np.isinf(val) else val
+                    for val in best_fit_line.tolist()
+                ],
+                "infiltration_rate": infiltration_rate,
+                #"delta_x": delta_x,
+                "delta_x": round(delta_x),  # Convert window size from minutes to hours
+                "y_average": y_average,
+            }
+
+        yield result
+
+
+def convert_best_window(window, max_points=None):
+    # Convert the best_windows results (which may include numpy arrays) into serializable lists.
+    window_time, window_depth = window
+    if max_points is not None:
+        keep = downsample_indices(
+            time_to_numeric(window_time), window_depth, max_points
+        )
+        window_time = window_time[keep]
+        window_depth = window_depth[keep]
+    window_time_str = [pd.Timestamp(x).isoformat() for x in window_time]
+    window_depth_list = window_depth.tolist()
+    return {
+        "window_time": window_time_str,
+        "window_depth": window_depth_list,
+    }
+
+
+def dataframe_records(df):
+    # Convert the datetime column to ISO format for JSON serialization.
+    df = df.reset_index()
+    df["datetime"] = df["datetime"].apply(lambda x: x.isoformat())
+    return df.to_dict(orient="records")
+
+
 @app.route("/api/infiltration", methods=["POST"])
 def infiltration():
     print("infiltration called")
+    # Get JSON input from the POST request. read before the try below, so a
+    # body that can't be decoded is answered by handle_http_error
+    request_data = request.get_json()
     try:
-        # Get JSON input from the POST request
-        request_data = request.get_json()
-        data = request_data.get("data")
+        try:
+            data = load_piezometer_data(request, request_data)
+        except ValueError as err:
+            print(err)
+            return jsonify({"error": str(err)}), 400
         smoothing_window = int(request_data.get("SMOOTHING_WINDOW"))
         regression_window = int(request_data.get("REGRESSION_WINDOW"))
         regression_threshold = float(request_data.get("REGRESSION_THRESHOLD"))
+        # optional, caps the number of points returned per plotted series.
+        # statistics are always computed on the full resolution data
+        max_points = request_data.get("MAX_POINTS")
+        if max_points is not None:
+            max_points = int(max_points)
+            # downsampling always keeps the first and last points, and needs
+            # at least one bucket in between
+            if max_points < 3:
+                return jsonify({"error": "MAX_POINTS must be at least 3"}), 400
 
         print("Parameters:", smoothing_window, regression_window, regression_threshold)
 
@@ -330,134 +651,65 @@ def infiltration():
         REGRESSION_WINDOW = regression_window
         REGRESSION_THRESHOLD = regression_threshold
 
-        # Create a dataframe from the provided data and convert the datetime column
-        df = pd.DataFrame(data)
-        print("Original datetime column:", df["datetime"])
-        df["datetime"] = pd.to_datetime(
-            df["datetime"]
-            .astype(str)
-            .str.replace(r"^(\d{4}-\d{2}-\d{2})$", r"\1 00:00:00", regex=True),
-            format="%Y-%m-%d %H:%M:%S",
+        # Create a dataframe from the provided data, indexed by datetime
+        df = format_piezometer_data(data)
+
+        results = piezometer_results(
+            df, smoothing_window, regression_window, regression_threshold, max_points
         )
 
-        # Prepare data frame for rolling operations in smoothing function
-        df = df.set_index("datetime")
-        df = df.sort_index()  # Ensure index is monotonic increasing
+        if streaming_requested(request):
+            # one record per piezometer as soon as its fit is done, then the
+            # data (with the smoothed series) in chunks, then a summary
+            def records():
+                piezometers = []
+                for result in results:
+                    piezometers.append(result["piezometer"])
+                    yield {"type": "piezometer", **result}
+
+                plot_df = df
+                if max_points is not None:
+                    plot_df = downsample_frame(df, max_points)
+                for start in range(0, len(plot_df), DATAFRAME_CHUNK_ROWS):
+                    yield {
+                        "type": "dataframe",
+                        "records": dataframe_records(
+                            plot_df.iloc[start : start + DATAFRAME_CHUNK_ROWS]
+                        ),
+                    }
+                yield {
+                    "type": "summary",
+                    "piezometers": piezometers,
+                    "rows": len(plot_df),
+                }
+
+            return ndjson_response(records())
 
         # Prepare dictionaries to store results for each piezometer column
         best_windows = {}
         best_params_list = {}
         best_r_squared_list = {}
         calc_results = {}
+        sampling = {}
 
-        # Dynamically determine which columns to process (all except 'datetime')
-        piezometer_cols = [col for col in df.columns]
-
-        for piez in piezometer_cols:
-            # Create a smoothed column name that replaces spaces with underscores
-            smoothed_col = f"smooth_{piez.replace(' ', '_')}"
-            df[smoothed_col], mean_delta_t = smooth_timeseries(df[piez])
-            print("delta t bar before round")
-            print(mean_delta_t)
-            mean_delta_t = round(mean_delta_t)
-            print("delta t bar after round")
-            print(mean_delta_t)
-            print("initial window size")
-            print(int(round(REGRESSION_WINDOW / mean_delta_t)))
-
-            # Fit the exponential decay model using the provided regression window size
-            best_window, best_params, best_fit, best_r_squared, window_size = fit_exponential_decay(
-                pd.Series(df.index), 
-                df[smoothed_col], 
-                mean_delta_t, # round delta t bar 
-                int(round(REGRESSION_WINDOW / mean_delta_t)),
-                regression_threshold
-            )
-
-            if best_window:
-                best_windows[piez] = best_window
-                best_params_list[piez] = (
-                    best_params.tolist() if best_params is not None else None
-                )
-                best_r_squared_list[piez] = best_r_squared
-
-                # Identify the best window start and end times
-                window_start = best_window[0][0]
-                window_end = best_window[0][-1]
-                best_window_indexes = df.index[
-                    (df.index >= window_start) & (df.index <= window_end)
-                ]
-
-                # Calculate infiltration rate parameters
-                k_value = best_params[1] * 3600  # Convert k from 1/s to 1/hr
-                y_average = df.loc[best_window_indexes, smoothed_col].mean()
-                delta_x = pd.Timedelta(window_end - window_start).total_seconds() / 3600
-                infiltration_rate = k_value * y_average
-                print("raw duration" + str(delta_x))
-                print(f"Best window for {piez}: {window_start} - {window_end}")
-                print(
-                    f"Average infiltration rate during the best window for {piez}: {infiltration_rate:.2f} cm/hr"
-                )
-                print(f"Duration of the best window for {piez}: {delta_x:.0f} hrs")
-                print(
-                    f"Average depth during the best window for {piez}: {y_average:.2f} cm"
-                )
+        for result in results:
+            piez = result["piezometer"]
+            best_windows[piez] = result["best_window"]
+            best_params_list[piez] = result["best_params"]
+            best_r_squared_list[piez] = result["best_r_squared"]
+            calc_results[piez] = result["calc_results"]
+            sampling[piez] = result["sampling"]
 
-                # Compute extended time series and best fit line for plotting
-                buffer_time = 0  # pd.Timedelta(minutes=720)
-                extended_time = pd.date_range(
-                    start=window_start - buffer_time,
-                    end=window_end + buffer_time,
-                    freq="T",
-                )
-                extended_time_numeric = (
-                    (extended_time - window_start).total_seconds().to_numpy()
-                )
-                best_fit_line = exponential_decay(extended_time_numeric, *best_params)
-
-                # Store computed values for this piezometer
-                calc_results[piez] = {
-                    "extended_time": [pd.Timestamp(x) for x in extended_time],
-                    "best_fit_line": [
-                        -88 if np.isnan(val) or np.isinf(val) else val
-                        for val in best_fit_line.tolist()
-                    ],
-                    "infiltration_rate": infiltration_rate,
-                    #"delta_x": delta_x,
-                    "delta_x": round(delta_x),  # Convert window size from minutes to hours
-                    "y_average": y_average,
-                }
-            else:
-                best_windows[piez] = None
-                best_params_list[piez] = None
-                best_r_squared_list[piez] = None
-                calc_results[piez] = None
-
-        # Convert the datetime column to ISO format for JSON serialization.
-        df = df.reset_index()
-        df["datetime"] = df["datetime"].apply(lambda x: x.isoformat())
-        dataframe_json = df.to_dict(orient="records")
-
-        # Convert the best_windows results (which may include numpy arrays) into serializable lists.
-        converted_best_windows = {}
-        for piez, window in best_windows.items():
-            if window is not None:
-                window_time, window_depth = window
-                window_time_str = [pd.Timestamp(x).isoformat() for x in window_time]
-                window_depth_list = window_depth.tolist()
-                converted_best_windows[piez] = {
-                    "window_time": window_time_str,
-                    "window_depth": window_depth_list,
-                }
-            else:
-                converted_best_windows[piez] = None
+        if max_points is not None:
+            df = downsample_frame(df, max_points)
 
         result = {
-            "dataframe": dataframe_json,
-            "best_windows": converted_best_windows,
+            "dataframe": dataframe_records(df),
+            "best_windows": best_windows,
             "best_params_list": best_params_list,
             "best_r_squared_list": best_r_squared_list,
             "calc_results": calc_results,
+            "sampling": sampling,
         }
 
         return jsonify(result)
@@ -465,3 +717,45 @@ def infiltration():
         print(e)
         # Return error message and a 500 status code if something goes wrong
         return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/infiltration/sweep", methods=["POST"])
+def infiltration_sweep():
+    # runs the infiltration analysis for every combination of the given
+    # parameters, reusing the smoothing and window fits between combinations
+    from .functions.infiltration import sweep_parameters
+
+    request_data = request.get_json()
+    try:
+        try:
+            data = load_piezometer_data(request, request_data)
+        except ValueError as err:
+            print(err)
+            return jsonify({"error": str(err)}), 400
+
+        # each parameter can be a single value or a list of values to try
+        smoothing_windows = parameter_grid(request_data, "SMOOTHING_WINDOW", int)
+        regression_windows = parameter_grid(request_data, "REGRESSION_WINDOW", int)
+        regression_thresholds = parameter_grid(
+            request_data, "REGRESSION_THRESHOLD", float
+        )
+
+        df = format_piezometer_data(data)
+
+        results = {}
+        for piez in df.columns:
+            results[piez] = format_statistics(
+                pd.DataFrame(
+                    sweep_parameters(
+                        df[piez],
+                        smoothing_windows,
+                        regression_windows,
+                        regression_thresholds,
+                    )
+                )
+            )
+
+        return jsonify({"results": results})
+    except Exception as e:
+        print(e)
+        return jsonify({"error": str(e)}), 500
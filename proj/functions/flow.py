@@ -1,4 +1,5 @@
 import pandas as pd
+from . import regular
 
 
 def get_runoff_duration(formatted_data):
@@ -9,7 +10,19 @@ def get_runoff_duration(formatted_data):
     return runoff_duration
 
 
+def get_time_range(formatted_data):
+    # first and last time of the series as it is on the 1 second grid
+    if "interval" in formatted_data.attrs:
+        return regular.get_time_range(formatted_data)
+
+    return formatted_data.index[0], formatted_data.index[-1]
+
+
 def get_runoff_volume(formatted_data, unit="s"):
+    # regularly sampled data skips the 1 second grid, see regular.py
+    if "interval" in formatted_data.attrs:
+        return regular.get_runoff_volume(formatted_data, unit=unit)
+
     runoff_volume_segments = formatted_data.dropna()
     runoff_volume_segments = runoff_volume_segments.rolling(window=2).apply(
         trapezoid, kwargs={"unit": unit}
@@ -28,6 +41,9 @@ def trapezoid(data_window, unit):
 
 
 def get_peak_flow_rate(formatted_data, minute_window=5):
+    if "interval" in formatted_data.attrs:
+        return regular.get_peak_flow_rate(formatted_data, minute_window)
+
     # assumes data starts at regular intervals i.e. if 15 min frequency, then data is taken at 12:00, 12:15, etc.
     # as opposed to 12:02, 12:17, etc.
     data = formatted_data.dropna()
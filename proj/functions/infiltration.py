@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 from scipy.optimize import curve_fit
 import math
 
@@ -27,9 +28,68 @@ def exponential_decay(t, y0, k, c):
     return y0 * np.exp(-k * t) + c
 
 
-def fit_exponential_decay(time, depth, mean_delta_t_s, window_size, regression_threshold=REGRESSION_THRESHOLD):
+def fit_window_size(time, depth, window_size):
+    """
+    Fits an exponential decay model to every window of one size in a time series of depth measurements.
+    Returns the best_window, best_params, best_fit and best_r_squared over those windows,
+    best_r_squared is -inf if no fit succeeded.
+    """
+    best_fit = None
+    best_params = None
+    best_r_squared = -np.inf
+    best_window = None
+
+    for i in range(len(time) - window_size + 1):
+        window_time = time.iloc[i : i + window_size].values
+        window_depth = depth.iloc[i : i + window_size].values
+        # Convert datetime to numeric values (seconds since the start of the window)
+        window_time_numeric = (window_time - window_time[0]) / np.timedelta64(1, "s")
+
+        # Original data
+        t_orig = np.array(window_time_numeric)
+        y_orig = np.array(window_depth)
+
+        # Normalize time to [0, 1] and depth to [0, 1]
+        t_max = np.max(t_orig)
+        y_max = np.max(y_orig)
+        t_norm = t_orig / t_max if t_max != 0 else t_orig
+        y_norm = y_orig / y_max if y_max != 0 else y_orig
+
+        try:
+            # Provide an initial guess for the parameters
+            params, _ = curve_fit(
+                exponential_decay,
+                t_norm,
+                y_norm,
+            )
+            # Calculate the R-squared value
+            residuals = y_norm - exponential_decay(t_norm, *params)
+            ss_res = np.sum(residuals**2)
+            ss_tot = np.sum((y_norm - np.mean(y_norm)) ** 2)
+            r_squared = 1 - (ss_res / ss_tot)
+
+            # Denormalize the params: y0, k, c
+            params[0] = params[0] * y_max  # y0
+            params[1] = params[1] / t_max  # k
+            params[2] = params[2] * y_max  # c
+
+            if r_squared > best_r_squared:
+                best_r_squared = r_squared
+                best_fit = exponential_decay(window_time_numeric, *params)
+                best_params = params
+                best_window = (window_time, window_depth)
+        except RuntimeError:
+            # If the fit fails, skip to the next window
+            continue
+
+    return best_window, best_params, best_fit, best_r_squared
+
+
+def fit_exponential_decay(time, depth, mean_delta_t_s, window_size, regression_threshold=REGRESSION_THRESHOLD, fit_cache=None):
     """
     Fits an exponential decay model to a time series of depth measurements within a sliding window.
+    fit_cache is an optional dict of fit_window_size results by window size. The results for a window size
+    don't depend on the threshold, so fits for the same depth series can reuse them across calls.
     Returns:
         best_window: tuple of (window_time, window_depth)
         best_params: list of parameters [y0, k] for the best fit
@@ -47,50 +107,15 @@ def fit_exponential_decay(time, depth, mean_delta_t_s, window_size, regression_t
     while best_r_squared < regression_threshold and window_size > 1:
         print(f"Trying window size: {window_size}")
 
-        for i in range(len(time) - window_size + 1):
-            window_time = time.iloc[i : i + window_size].values
-            window_depth = depth.iloc[i : i + window_size].values
-            # Convert datetime to numeric values (seconds since the start of the window)
-            window_time_numeric = (window_time - window_time[0]) / np.timedelta64(
-                1, "s"
-            )
+        if fit_cache is not None and window_size in fit_cache:
+            window_result = fit_cache[window_size]
+        else:
+            window_result = fit_window_size(time, depth, window_size)
+            if fit_cache is not None:
+                fit_cache[window_size] = window_result
 
-            # Original data
-            t_orig = np.array(window_time_numeric)
-            y_orig = np.array(window_depth)
-
-            # Normalize time to [0, 1] and depth to [0, 1]
-            t_max = np.max(t_orig)
-            y_max = np.max(y_orig)
-            t_norm = t_orig / t_max if t_max != 0 else t_orig
-            y_norm = y_orig / y_max if y_max != 0 else y_orig
-
-            try:
-                # Provide an initial guess for the parameters
-                params, _ = curve_fit(
-                    exponential_decay,
-                    t_norm,
-                    y_norm,
-                )
-                # Calculate the R-squared value
-                residuals = y_norm - exponential_decay(t_norm, *params)
-                ss_res = np.sum(residuals**2)
-                ss_tot = np.sum((y_norm - np.mean(y_norm)) ** 2)
-                r_squared = 1 - (ss_res / ss_tot)
-
-                # Denormalize the params: y0, k, c
-                params[0] = params[0] * y_max  # y0
-                params[1] = params[1] / t_max  # k
-                params[2] = params[2] * y_max  # c
-
-                if r_squared > best_r_squared:
-                    best_r_squared = r_squared
-                    best_fit = exponential_decay(window_time_numeric, *params)
-                    best_params = params
-                    best_window = (window_time, window_depth)
-            except RuntimeError:
-                # If the fit fails, skip to the next window
-                continue
+        if window_result[3] > best_r_squared:
+            best_window, best_params, best_fit, best_r_squared = window_result
 
         # If no acceptable fit is found, reduce the window size and try again
         if best_r_squared < regression_threshold:
@@ -100,3 +125,70 @@ def fit_exponential_decay(time, depth, mean_delta_t_s, window_size, regression_t
             window_size -= math.floor(60 / mean_delta_t_s) # round down to get more data points for the window size, we want to reduce just a little bit.
     print(f"Finished. Fitted parameters: {best_params}, R-squared: {best_r_squared}")
     return best_window, best_params, best_fit, best_r_squared, window_size
+
+
+def get_infiltration_rate(smoothed, best_window, best_params):
+    """
+    Infiltration rate over the best window, from the fitted decay rate and the average smoothed depth.
+    Returns infiltration_rate (cm/hr), delta_x (window duration in hours) and y_average (cm).
+    """
+    window_start = best_window[0][0]
+    window_end = best_window[0][-1]
+    in_window = (smoothed.index >= window_start) & (smoothed.index <= window_end)
+
+    k_value = best_params[1] * 3600  # Convert k from 1/s to 1/hr
+    y_average = smoothed[in_window].mean()
+    delta_x = pd.Timedelta(window_end - window_start).total_seconds() / 3600
+    infiltration_rate = k_value * y_average
+    return infiltration_rate, delta_x, y_average
+
+
+def sweep_parameters(depth, smoothing_windows, regression_windows, regression_thresholds):
+    """
+    Runs the infiltration analysis of one piezometer for every combination of parameters.
+    The depth series is smoothed once per smoothing window, and the fits for each window size are
+    shared between all regression windows and thresholds for the same smoothed series.
+    Returns a list of dicts, one per combination.
+    """
+    results = []
+    for smoothing_window in smoothing_windows:
+        smoothed, mean_delta_t = smooth_timeseries(depth, smoothing_window)
+        mean_delta_t = round(mean_delta_t)
+        fit_cache = {}
+        for regression_window in regression_windows:
+            for regression_threshold in regression_thresholds:
+                best_window, best_params, _, best_r_squared, window_size = fit_exponential_decay(
+                    pd.Series(smoothed.index),
+                    smoothed,
+                    mean_delta_t,
+                    int(round(regression_window / mean_delta_t)),
+                    regression_threshold,
+                    fit_cache=fit_cache,
+                )
+                result = {
+                    "SMOOTHING_WINDOW": smoothing_window,
+                    "REGRESSION_WINDOW": regression_window,
+                    "REGRESSION_THRESHOLD": regression_threshold,
+                    "infiltration_rate": None,
+                    "r_squared": None,
+                    "window_start": None,
+                    "window_end": None,
+                    "delta_x": None,
+                    "y_average": None,
+                }
+                if best_window:
+                    infiltration_rate, delta_x, y_average = get_infiltration_rate(
+                        smoothed, best_window, best_params
+                    )
+                    result.update(
+                        {
+                            "infiltration_rate": infiltration_rate,
+                            "r_squared": best_r_squared,
+                            "window_start": pd.Timestamp(best_window[0][0]).isoformat(),
+                            "window_end": pd.Timestamp(best_window[0][-1]).isoformat(),
+                            "delta_x": round(delta_x),
+                            "y_average": y_average,
+                        }
+                    )
+                results.append(result)
+    return results
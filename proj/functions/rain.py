@@ -1,8 +1,13 @@
 import pandas as pd
 import numpy as np
+from . import regular
 
 
 def get_first_rain(formatted_data, hour_window=12):
+    # regularly sampled data skips the 1 second grid, see regular.py
+    if "interval" in formatted_data.attrs:
+        return regular.get_first_rain(formatted_data, hour_window)
+
     # expects formatted data from format_data function
     # if rain depth is 0, then no rain, but for the purposes of this function
     # it is convenient to convert these to NaNs
@@ -45,6 +50,9 @@ def get_first_rain(formatted_data, hour_window=12):
 
 
 def get_last_rain(formatted_data, first_rain, hour_window=12):
+    if "interval" in formatted_data.attrs:
+        return regular.get_last_rain(formatted_data, first_rain, hour_window)
+
     # expects formatted data from format_data function
     tmp = formatted_data.copy()
     tmp[tmp == 0] = np.nan
@@ -73,6 +81,9 @@ def get_total_rainfall_duration(first_rain, last_rain):
 
 
 def get_total_rainfall(formatted_data, first_rain, last_rain):
+    if "interval" in formatted_data.attrs:
+        return regular.get_total_rainfall(formatted_data, first_rain, last_rain)
+
     first_last = pd.DataFrame({"first_rain": first_rain, "last_rain": last_rain})
     total_rainfall = first_last.apply(
         lambda x: formatted_data[x.first_rain : x.last_rain].sum(), axis=1
@@ -87,6 +98,11 @@ def get_avg_rainfall_intensity(total_rainfall, total_rainfall_duration):
 
 
 def get_peak_rainfall_intensity(formatted_data, first_rain, last_rain, minute_window=5):
+    if "interval" in formatted_data.attrs:
+        return regular.get_peak_rainfall_intensity(
+            formatted_data, first_rain, last_rain, minute_window
+        )
+
     first_last = pd.DataFrame({"first_rain": first_rain, "last_rain": last_rain})
     # peak_rainfall_intensity = first_last.apply(
     #     lambda x: formatted_data[x.first_rain: x.last_rain].rolling(window = f"{minute_window}T").apply(custom_mean, raw = True, kwargs = {"minute_window": minute_window})[calculate_start_time(x.first_rain, x.last_rain, minute_window): ].max(),
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+# Fast path for series sampled at a regular interval (most loggers record every
+# 1, 5, 10 or 15 minutes). Instead of reindexing onto a 1 second grid and using
+# time based pandas rolling windows, the windows are a fixed number of samples,
+# so they can be computed directly on the samples with numpy. Each function
+# gives the same result as its counterpart in rain.py/flow.py
+# on the 1 second grid, and is only used when format_data found the series to
+# be regular (see get_sampling).
+
+
+def get_sampling(index, values=None):
+    # describes how a series was sampled, so regular series can take the fast
+    # path and irregular ones can be reported back to the client
+    times = np.asarray(index, dtype="datetime64[ns]").astype("int64")
+    sampling = {
+        "samples": len(times),
+        "regular": False,
+        "interval_s": None,
+        "gaps": 0,
+        "duplicates": 0,
+        "sorted": True,
+        "missing_values": 0,
+    }
+    if values is not None:
+        sampling["missing_values"] = int(pd.isna(values).sum())
+    if len(times) < 2:
+        return sampling
+
+    diffs = np.diff(times)
+    sampling["sorted"] = bool((diffs >= 0).all())
+    diffs = np.diff(np.sort(times))
+    sampling["duplicates"] = int((diffs == 0).sum())
+    steps = diffs[diffs > 0]
+    if len(steps) == 0:
+        return sampling
+
+    # the most common step is taken as the logging interval, anything longer is
+    # a gap (one or more missing samples)
+    unique_steps, counts = np.unique(steps, return_counts=True)
+    interval = unique_steps[np.argmax(counts)]
+    sampling["interval_s"] = interval / 1e9
+    sampling["gaps"] = int((steps > interval).sum())
+    sampling["regular"] = bool(
+        sampling["sorted"]
+        and sampling["duplicates"] == 0
+        and (steps == interval).all()
+        # the kernels work in whole seconds, like the 1 second grid does
+        and interval % 10**9 == 0
+        and (times % 10**9 == 0).all()
+    )
+    if sampling["regular"]:
+        sampling["interval_s"] = int(interval // 10**9)
+    return sampling
+
+
+def to_seconds(times):
+    times = np.asarray(times, dtype="datetime64[ns]")
+    return times.astype("datetime64[s]").astype("int64")
+
+
+def to_datetimes(seconds):
+    seconds = np.asarray(seconds, dtype="int64")
+    return seconds.astype("datetime64[s]").astype("datetime64[ns]")
+
+
+def trailing_window_sums(values, window):
+    # sum of each sample and the window - 1 samples before it, fewer at the
+    # start of the series
+    return np.convolve(values, np.ones(window))[: len(values)]
+
+
+def get_first_rain(formatted_data, hour_window=12):
+    # a rain event starts with a tip that has no other tip in the hour_window
+    # before it, which is exactly where the rolling 12 hour sum on the 1 second
+    # grid changes from NaN to a value
+    times = to_seconds(formatted_data.index)
+    values = formatted_data.to_numpy()
+    tips = times[(values != 0) & ~np.isnan(values)]
+    new_event = np.diff(tips) > hour_window * 3600
+    return to_datetimes(tips[np.concatenate(([True], new_event))[: len(tips)]])
+
+
+def get_last_rain(formatted_data, first_rain, hour_window=12):
+    # and it ends with a tip that has no other tip in the hour_window after it
+    times = to_seconds(formatted_data.index)
+    values = formatted_data.to_numpy()
+    tips = times[(values != 0) & ~np.isnan(values)]
+    end_event = np.diff(tips) > hour_window * 3600
+    last_rain = to_datetimes(tips[np.concatenate((end_event, [True]))[: len(tips)]])
+    if len(last_rain) != len(first_rain):
+        # the 1 second grid ends at the minute after the last sample
+        grid_end = formatted_data.index.ceil("min")[-1].to_datetime64()
+        last_rain = np.append(last_rain, grid_end.astype("datetime64[ns]"))
+    return last_rain
+
+
+def get_total_rainfall(formatted_data, first_rain, last_rain):
+    times = to_seconds(formatted_data.index)
+    values = formatted_data.to_numpy()
+    starts = np.searchsorted(times, to_seconds(first_rain), side="left")
+    ends = np.searchsorted(times, to_seconds(last_rain), side="right")
+    return np.array(
+        [values[i:j].sum() for i, j in zip(starts, ends)], dtype="float64"
+    )
+
+
+def get_peak_rainfall_intensity(
+    formatted_data, first_rain, last_rain, minute_window=5
+):
+    interval = formatted_data.attrs["interval"]
+    times = to_seconds(formatted_data.index)
+    values = formatted_data.to_numpy()
+    window_s = minute_window * 60
+    # the rolling window (t - minute_window, t] holds this many samples
+    window = -(-window_s // interval)
+
+    peaks = []
+    for first, last in zip(to_seconds(first_rain), to_seconds(last_rain)):
+        i = np.searchsorted(times, first, side="left")
+        j = np.searchsorted(times, last, side="right")
+        event_times = times[i:j]
+        sums = trailing_window_sums(values[i:j], window)
+
+        # the peak is searched from minute_window after the first rain, unless
+        # the event is shorter than that
+        start = first if last - first < window_s else first + window_s
+        candidates = list(sums[event_times >= start])
+        if start not in event_times:
+            # the window ending at start (between samples) is also a candidate
+            in_window = (event_times > start - window_s) & (event_times <= start)
+            if in_window.any():
+                candidates.append(values[i:j][in_window].sum())
+
+        candidates = np.array(candidates, dtype="float64")
+        candidates[candidates < 1e-9] = 0
+        peaks.append(candidates.max() if len(candidates) else np.nan)
+    return np.array(peaks, dtype="float64") * 60 / minute_window
+
+
+def get_time_range(formatted_data):
+    # the 1 second grid starts at the minute of the first sample and ends at
+    # the minute after the last one
+    index = formatted_data.index
+    return index.floor("min")[0], index.ceil("min")[-1]
+
+
+def get_runoff_volume(formatted_data, unit="s"):
+    units_dict = {"L/s": 1, "gal/min": 60, "ft3/s": 1}
+    values = formatted_data.to_numpy()
+    diff = formatted_data.attrs["interval"]
+    if unit in units_dict:
+        diff = diff / units_dict[unit]
+    segments = (values[:-1] + values[1:]) / 2 * diff
+    # the rolling version has no segment for the first sample, summing with a
+    # zero in its place keeps the floating point result identical
+    return np.concatenate(([0.0], segments)).sum()
+
+
+def get_peak_flow_rate(formatted_data, minute_window=5):
+    interval = formatted_data.attrs["interval"]
+    times = to_seconds(formatted_data.index)
+    values = formatted_data.to_numpy()
+    window_s = minute_window * 60
+
+    if round(pd.Timedelta(seconds=interval).seconds / 60) > minute_window:
+        # data is interpolated onto a minute_window grid starting at the minute
+        # of the first sample. interpolation never exceeds the samples it's
+        # between, so the peak is the largest sample that falls on the grid
+        grid_start = times[0] - times[0] % 60
+        on_grid = (times - grid_start) % window_s == 0
+        return values[on_grid].max() if on_grid.any() else np.nan
+
+    window = -(-window_s // interval)
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return (trailing_window_sums(values, window) / counts).max()
+
@@ -0,0 +1,119 @@
+import gzip
+import io
+import zlib
+
+from werkzeug.exceptions import (
+    BadRequest,
+    RequestEntityTooLarge,
+    UnsupportedMediaType,
+)
+from werkzeug.wsgi import get_input_stream
+
+# zstd support is optional, if the package isn't installed we just don't
+# accept or offer it and fall back to gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# responses smaller than this aren't worth the cpu time to compress
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def supported_encodings():
+    # in order of preference when the client accepts several equally
+    encodings = ["gzip"]
+    if zstandard is not None:
+        encodings.insert(0, "zstd")
+    return encodings
+
+
+class DecodingStream(io.RawIOBase):
+    # wraps a decompressing reader so a corrupt body turns into a 400 instead
+    # of an unhandled OSError/zlib.error somewhere inside request.get_json(),
+    # and enforces max_content_length on the decompressed size (a few kB of gzip
+    # can expand to gigabytes)
+    def __init__(self, reader, max_content_length=None):
+        self.reader = reader
+        self.max_content_length = max_content_length
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            data = self.reader.read(len(buffer))
+        except (OSError, EOFError, zlib.error) as err:
+            raise BadRequest(f"Could not decode request body: {err}")
+        except Exception as err:
+            if zstandard is not None and isinstance(err, zstandard.ZstdError):
+                raise BadRequest(f"Could not decode request body: {err}")
+            raise
+        self.bytes_read += len(data)
+        if (
+            self.max_content_length is not None
+            and self.bytes_read > self.max_content_length
+        ):
+            raise RequestEntityTooLarge()
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def decode_request_body(environ, max_content_length=None):
+    # swap the wsgi input stream for one that decompresses on the fly, so the
+    # body is never held in memory in its compressed and decompressed forms at once
+    encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+    if encoding in ("", "identity"):
+        return
+
+    # bounded by the original Content-Length, so the decompressor can't read
+    # past the end of the body
+    raw = get_input_stream(environ)
+    if encoding in ("gzip", "x-gzip"):
+        reader = gzip.GzipFile(fileobj=raw, mode="rb")
+    elif encoding == "zstd" and zstandard is not None:
+        reader = zstandard.ZstdDecompressor().stream_reader(raw)
+    else:
+        raise UnsupportedMediaType(f"Unsupported Content-Encoding: {encoding}")
+
+    environ["wsgi.input"] = io.BufferedReader(
+        DecodingStream(reader, max_content_length)
+    )
+    # the decompressed length isn't known ahead of time, marking the stream as
+    # terminated lets werkzeug read it to the end instead of treating it as empty
+    environ["wsgi.input_terminated"] = True
+    environ.pop("CONTENT_LENGTH", None)
+    environ.pop("HTTP_CONTENT_ENCODING", None)
+
+
+def compress_response(request, response, min_size=COMPRESS_MIN_SIZE):
+    response.vary.add("Accept-Encoding")
+
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    if encoding == "zstd":
+        data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    return response
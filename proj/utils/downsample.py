@@ -0,0 +1,82 @@
+import numpy as np
+
+
+def lttb_indices(x, y, max_points):
+    # Largest-Triangle-Three-Buckets downsampling, returns the (sorted) indices
+    # of the points to keep. x must be increasing. the first and last points are
+    # always kept, and every bucket in between contributes the point that forms
+    # the largest triangle with the previously kept point and the average of
+    # the next bucket, which preserves peaks and troughs much better than
+    # taking every n-th sample
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n = len(x)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1])[:max_points]
+
+    # buckets split the interior points 1..n-2 as evenly as possible
+    edges = np.linspace(1, n - 1, max_points - 1).astype("int64")
+    starts = edges[:-1]
+    ends = edges[1:]
+
+    # average of each bucket in one pass, the "next bucket" for the last interior
+    # bucket is the final point
+    x_sum = np.concatenate(([0.0], np.cumsum(x)))
+    y_sum = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    x_avg = np.append((x_sum[ends] - x_sum[starts]) / counts, x[-1])
+    y_avg = np.append((y_sum[ends] - y_sum[starts]) / counts, y[-1])
+
+    indices = np.empty(max_points, dtype="int64")
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    # each step depends on the point kept in the previous bucket, so only the
+    # loop over buckets is sequential, the search within a bucket is vectorized
+    for i in range(max_points - 2):
+        bx = x[starts[i] : ends[i]]
+        by = y[starts[i] : ends[i]]
+        cx = x_avg[i + 1]
+        cy = y_avg[i + 1]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = starts[i] + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample_indices(x, y, max_points):
+    # lttb_indices, but ignoring missing values so they can't win (or break)
+    # the triangle area comparison
+    y = np.asarray(y, dtype="float64")
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= max_points:
+        return finite
+    x = np.asarray(x, dtype="float64")
+    return finite[lttb_indices(x[finite], y[finite], max_points)]
+
+
+def time_to_numeric(time):
+    # seconds since epoch as floats, from anything numpy can read as datetime64
+    return np.asarray(time, dtype="datetime64[ns]").astype("int64") / 1e9
+
+
+def downsample_frame(df, max_points):
+    # downsample a datetime indexed dataframe with one or more value columns,
+    # keeping whole rows. the point budget is split between the columns and the
+    # union of the points each column picks is kept, so no series loses its
+    # peaks to another
+    if len(df) <= max_points or df.shape[1] == 0:
+        return df
+    x = time_to_numeric(df.index)
+    points_per_column = max(max_points // df.shape[1], 3)
+    keep = np.unique(
+        np.concatenate(
+            [
+                downsample_indices(x, df[col].to_numpy(dtype="float64"), points_per_column)
+                for col in df.columns
+            ]
+        )
+    )
+    return df.iloc[keep]
@@ -0,0 +1,109 @@
+import cProfile
+import hmac
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# profiling is only possible if this is set, requests then need ?profile=1
+# and the token in the X-Profile-Token header
+PROFILE_TOKEN = os.environ.get("BMP_PROFILE_TOKEN")
+# if set, the raw cProfile output of each profiled request is saved here, it
+# can be opened with pstats or snakeviz
+PROFILE_DIR = os.environ.get("BMP_PROFILE_DIR")
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# tracemalloc is process wide and only one profiler can be active at a time,
+# so profiled requests run one after another
+profile_lock = threading.Lock()
+
+
+def profiling_requested(request):
+    if PROFILE_TOKEN is None or request.args.get("profile") != "1":
+        return False
+    token = request.headers.get("X-Profile-Token", "")
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.start_time = None
+        self.running = False
+
+    def start(self):
+        profile_lock.acquire()
+        tracemalloc.start()
+        self.start_time = time.perf_counter()
+        self.profiler.enable()
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self.start_time
+        self.snapshot = tracemalloc.take_snapshot()
+        self.current_memory, self.peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.running = False
+        profile_lock.release()
+
+    def summary(self, name):
+        stats = pstats.Stats(self.profiler)
+        functions = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in (
+            stats.stats.items()
+        ):
+            functions.append(
+                {
+                    "function": function,
+                    "file": shorten_path(filename),
+                    "line": line,
+                    "calls": calls,
+                    "total_time_s": round(total, 6),
+                    "cumulative_time_s": round(cumulative, 6),
+                }
+            )
+        functions.sort(key=lambda x: x["cumulative_time_s"], reverse=True)
+
+        allocations = [
+            {
+                "location": f"{shorten_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in self.snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+        ]
+
+        if PROFILE_DIR is not None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            stats.dump_stats(
+                os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}.prof")
+            )
+
+        return {
+            "elapsed_s": round(self.elapsed, 6),
+            "peak_memory_kb": round(self.peak_memory / 1024, 1),
+            "top_functions": functions[:TOP_FUNCTIONS],
+            # the app's own functions (load_data, format_data, the rain/flow
+            # statistics, fit_exponential_decay, ...) are always listed, even
+            # if library internals push them out of the overall top list
+            "project_functions": [
+                x for x in functions if x["file"].startswith("proj/")
+            ],
+            "top_allocations": allocations,
+        }
+
+
+def shorten_path(filename):
+    # paths relative to the project, or to site-packages for libraries
+    if filename.startswith(PROJECT_DIR):
+        return os.path.relpath(filename, os.path.dirname(PROJECT_DIR))
+    if "site-packages" in filename:
+        return filename.split("site-packages" + os.sep, 1)[1]
+    return filename
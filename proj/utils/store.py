@@ -0,0 +1,266 @@
+import contextlib
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+# directory for the local dataset store, uploaded series are kept here so they
+# don't have to be re-sent with every request. the store is disabled if unset
+STORE_DIR = os.environ.get("BMP_DATA_STORE")
+STORE_FILE = "series.sqlite3"
+
+# rows are clustered on (site_id, data_type, name, datetime), so reading a date
+# range of one series only touches the pages holding that range.
+# data_type is a key of valid_keys (rain, inflow1, ...) or "piezometer", name
+# is the value column (rain, flow, or the piezometer's name)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    site_id TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    datetime INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (site_id, data_type, name, datetime)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS time_units (
+    site_id TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    time_unit TEXT,
+    PRIMARY KEY (site_id, data_type)
+);
+"""
+
+
+def store_enabled():
+    return STORE_DIR is not None
+
+
+# database files that have already been set up by this process
+initialized_stores = set()
+init_lock = threading.Lock()
+
+
+def init_store(path):
+    # creates the tables and switches to WAL (which lets requests read while
+    # another one is appending). both are stored in the database file, so this
+    # only has to happen on the first connection
+    with init_lock:
+        if path in initialized_stores:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with contextlib.closing(sqlite3.connect(path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        initialized_stores.add(path)
+
+
+def connect():
+    # callers have to close the connection, e.g. with contextlib.closing
+    if not store_enabled():
+        raise ValueError("Data store is not configured, set BMP_DATA_STORE")
+    path = os.path.join(STORE_DIR, STORE_FILE)
+    if path not in initialized_stores:
+        init_store(path)
+    return sqlite3.connect(path)
+
+
+def to_epoch_seconds(datetimes):
+    return pd.to_datetime(pd.Series(datetimes)).to_numpy(
+        dtype="datetime64[s]"
+    ).astype("int64")
+
+
+def from_epoch_seconds(seconds):
+    # same format clients send, so stored data goes through the endpoints
+    # exactly like an inline payload would
+    return pd.to_datetime(seconds, unit="s").strftime("%Y-%m-%d %H:%M:%S")
+
+
+def single_time_unit(time_unit):
+    # time_unit may be sent as a string or as a list with one entry per sample
+    if time_unit is None or isinstance(time_unit, str):
+        return time_unit
+    time_unit_list = [x for x in set(time_unit) if x is not None]
+    return time_unit_list[0] if time_unit_list else None
+
+
+def parse_upload(inc_data, valid_keys):
+    # turns an upload body into (data_type, name, datetime, value) frames.
+    # the body can contain any of the rain/flow series in the same format as
+    # the endpoints take them, plus "piezometers" in the /api/infiltration format
+    if not isinstance(inc_data, dict):
+        raise ValueError("Data not parsed as a dict")
+
+    data_types = set(inc_data.keys()) - {"piezometers"}
+    if not data_types.issubset(set(valid_keys.keys())):
+        raise ValueError(f"Invalid data types: {data_types - set(valid_keys.keys())}")
+
+    series = []
+    time_units = {}
+    for data_type in data_types:
+        if set(inc_data[data_type].keys()) != valid_keys[data_type]:
+            raise ValueError(f"Data type {data_type} has invalid keys")
+        name = "rain" if data_type == "rain" else "flow"
+        df = pd.DataFrame(
+            {
+                "datetime": to_epoch_seconds(inc_data[data_type]["datetime"]),
+                "value": pd.to_numeric(inc_data[data_type][name]),
+            }
+        )
+        series.append((data_type, name, df))
+        if "time_unit" in valid_keys[data_type]:
+            time_units[data_type] = single_time_unit(
+                inc_data[data_type]["time_unit"]
+            )
+
+    if "piezometers" in inc_data:
+        piezometers = pd.DataFrame(inc_data["piezometers"])
+        if "datetime" not in piezometers.columns:
+            raise ValueError("Piezometer data has no datetime column")
+        datetimes = to_epoch_seconds(piezometers.pop("datetime"))
+        for name in piezometers.columns:
+            df = pd.DataFrame(
+                {"datetime": datetimes, "value": pd.to_numeric(piezometers[name])}
+            )
+            series.append(("piezometer", name, df.dropna()))
+
+    return series, time_units
+
+
+def append_site_data(site_id, inc_data, valid_keys):
+    # new samples are added to what's already stored for the site, samples at
+    # an already stored time replace the old value
+    series, time_units = parse_upload(inc_data, valid_keys)
+    counts = {}
+    # the inner with commits, or rolls back if anything fails, the outer one
+    # closes the connection either way
+    with contextlib.closing(connect()) as conn, conn:
+        for data_type, name, df in series:
+            conn.executemany(
+                "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)",
+                (
+                    (site_id, data_type, name, int(t), None if np.isnan(v) else float(v))
+                    for t, v in zip(df["datetime"], df["value"])
+                ),
+            )
+            key = data_type if data_type != "piezometer" else name
+            counts[key] = len(df)
+        conn.executemany(
+            "INSERT OR REPLACE INTO time_units VALUES (?, ?, ?)",
+            ((site_id, data_type, unit) for data_type, unit in time_units.items()),
+        )
+    return counts
+
+
+def describe_site(site_id):
+    with contextlib.closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT data_type, name, COUNT(*), MIN(datetime), MAX(datetime) "
+            "FROM series WHERE site_id = ? GROUP BY data_type, name",
+            (site_id,),
+        ).fetchall()
+    return {
+        (data_type if data_type != "piezometer" else name): {
+            "data_type": data_type,
+            "count": count,
+            "start": from_epoch_seconds([first])[0],
+            "end": from_epoch_seconds([last])[0],
+        }
+        for data_type, name, count, first, last in rows
+    }
+
+
+def time_range(start, end):
+    # start and end are both inclusive, either can be left out. an end date
+    # without a time includes that whole day, i.e. everything before the next
+    # midnight (times are stored in whole seconds)
+    if end and re.fullmatch(r"\s*\d{4}-\d{2}-\d{2}\s*", end):
+        end = pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    start = to_epoch_seconds([start])[0] if start else np.iinfo("int64").min
+    end = to_epoch_seconds([end])[0] if end else np.iinfo("int64").max
+    return int(start), int(end)
+
+
+def read_series(conn, site_id, data_type, start, end):
+    # returns {name: (datetimes, values)} for one data type within the range
+    rows = conn.execute(
+        "SELECT name, datetime, value FROM series "
+        "WHERE site_id = ? AND data_type = ? AND datetime BETWEEN ? AND ? "
+        "ORDER BY name, datetime",
+        (site_id, data_type, start, end),
+    ).fetchall()
+    if not rows:
+        return {}
+    names = np.array([row[0] for row in rows])
+    datetimes = np.array([row[1] for row in rows], dtype="int64")
+    values = np.array([row[2] for row in rows], dtype="float64")
+    split = np.flatnonzero(names[1:] != names[:-1]) + 1
+    return {
+        name_group[0]: (datetime_group, value_group)
+        for name_group, datetime_group, value_group in zip(
+            np.split(names, split), np.split(datetimes, split), np.split(values, split)
+        )
+    }
+
+
+def read_site_data(site_id, path, valid_keys, start=None, end=None):
+    # returns stored data in the same shape load_data returns for an inline
+    # payload to the same endpoint
+    start, end = time_range(start, end)
+    if path == "/api/rain":
+        data_types = ["rain"]
+    elif path == "/api/flow":
+        data_types = [x for x in valid_keys if "flow" in valid_keys[x]]
+    elif path == "/api/rainflow":
+        data_types = list(valid_keys)
+    else:
+        raise ValueError("Some other error occurred")
+
+    data = {}
+    with contextlib.closing(connect()) as conn:
+        for data_type in data_types:
+            stored = read_series(conn, site_id, data_type, start, end)
+            if not stored:
+                continue
+            name = "rain" if data_type == "rain" else "flow"
+            datetimes, values = stored[name]
+            df = pd.DataFrame(
+                {"datetime": from_epoch_seconds(datetimes), name: values}
+            )
+            if "time_unit" in valid_keys[data_type]:
+                row = conn.execute(
+                    "SELECT time_unit FROM time_units WHERE site_id = ? AND data_type = ?",
+                    (site_id, data_type),
+                ).fetchone()
+                df["time_unit"] = row[0] if row else None
+            data[data_type] = df
+
+    if not data:
+        raise ValueError(f"No stored data for site {site_id} in the requested range")
+    if path == "/api/rain":
+        if "rain" not in data:
+            raise ValueError(f"No stored rain data for site {site_id}")
+        return data["rain"]
+    return data
+
+
+def read_site_piezometers(site_id, start=None, end=None):
+    # stored piezometer data as a frame with a datetime column and one column
+    # per piezometer, like the records /api/infiltration takes
+    start, end = time_range(start, end)
+    with contextlib.closing(connect()) as conn:
+        stored = read_series(conn, site_id, "piezometer", start, end)
+    if not stored:
+        raise ValueError(f"No stored piezometer data for site {site_id}")
+    df = pd.concat(
+        {
+            name: pd.Series(values, index=datetimes)
+            for name, (datetimes, values) in stored.items()
+        },
+        axis=1,
+    ).sort_index()
+    df.insert(0, "datetime", from_epoch_seconds(df.index))
+    return df.reset_index(drop=True)
@@ -1,10 +1,24 @@
 import pandas as pd
 import json
+from .store import read_site_data, read_site_piezometers
+from ..functions.regular import get_sampling
 
 # TODO: data validation - only accept 1, 5, 10, 15 min data
 
 
 def load_data(request, valid_keys):
+    # data previously uploaded for a site can be used instead of an inline payload,
+    # e.g. /api/rain?site_id=abc&start=2023-01-01&end=2023-03-31
+    site_id = request.args.get("site_id")
+    if site_id is not None:
+        return read_site_data(
+            site_id,
+            request.path,
+            valid_keys,
+            start=request.args.get("start"),
+            end=request.args.get("end"),
+        )
+
     # expects incoming data in json format
     if request.json is None:
         raise ValueError("No json sent")
@@ -41,6 +55,18 @@ def load_data(request, valid_keys):
     return data
 
 
+def load_piezometer_data(request, request_data):
+    # the piezometer records of an /api/infiltration style request, or the ones
+    # uploaded for a site, e.g. /api/infiltration?site_id=abc&start=2023-01-01.
+    # raises ValueError for an unknown site, an empty range or no store
+    site_id = request.args.get("site_id")
+    if site_id is not None:
+        return read_site_piezometers(
+            site_id, start=request.args.get("start"), end=request.args.get("end")
+        )
+    return request_data.get("data")
+
+
 def format_data(data):
     # need to make a time_index with resolution of 1 second in order to properly
     # use the window/rolling function later, since data may be recorded
@@ -48,15 +74,52 @@ def format_data(data):
     # imputed timestamps will have nan values
     data["datetime"] = pd.to_datetime(data["datetime"]).sort_values()
     tmp = data.iloc[:, 0:2].set_index("datetime").squeeze(axis=1)
+
+    # regularly sampled data (no gaps, duplicates or missing values) is kept as
+    # is, the rain/flow functions use fixed size windows on it instead of the grid
+    sampling = get_sampling(tmp.index, tmp.to_numpy())
+    if sampling["regular"] and not sampling["missing_values"]:
+        formatted_data = tmp.astype("float64")
+        formatted_data.attrs["interval"] = sampling["interval_s"]
+        formatted_data.attrs["sampling"] = sampling
+        return formatted_data
+
     # start from beginning of submitted data, end at the end, rounding to the
     # lower and upper minute values respectively
     time_index = pd.date_range(
         start=tmp.index.floor("T")[0], end=tmp.index.ceil("T")[-1], freq="1S"
     )
     formatted_data = pd.Series(data=tmp, index=time_index)
+    formatted_data.attrs["sampling"] = sampling
     return formatted_data
 
 
+def format_piezometer_data(data):
+    # piezometer data comes as records, [{"datetime": ..., "PZ1": ..., ...}, ...]
+    df = pd.DataFrame(data)
+    print("Original datetime column:", df["datetime"])
+    # dates without a time are at midnight
+    df["datetime"] = pd.to_datetime(
+        df["datetime"]
+        .astype(str)
+        .str.replace(r"^(\d{4}-\d{2}-\d{2})$", r"\1 00:00:00", regex=True),
+        format="%Y-%m-%d %H:%M:%S",
+    )
+
+    # Prepare data frame for rolling operations in smoothing function
+    df = df.set_index("datetime")
+    df = df.sort_index()  # Ensure index is monotonic increasing
+    return df
+
+
+def parameter_grid(request_data, name, cast):
+    # a parameter given as a single value or a list of values, as a list
+    values = request_data.get(name)
+    if not isinstance(values, list):
+        values = [values]
+    return [cast(x) for x in values]
+
+
 def format_statistics(df):
     # awkward, but need to use pandas to_json to correctly format NaNs to null for correct json spec,
     # then load that string to nest final dictionary object, for returning final json body + response
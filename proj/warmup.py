@@ -0,0 +1,58 @@
+import contextlib
+import gc
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def make_warmup_payloads():
+    # small but realistic requests for each endpoint, enough to go through
+    # every code path (datetime parsing, rolling windows, curve fitting) once
+    times = pd.date_range("2023-01-01", periods=288, freq="5min")
+    datetimes = [x.strftime("%Y-%m-%d %H:%M:%S") for x in times]
+    rain = np.where(np.arange(288) % 144 < 6, 0.254, 0).tolist()
+    flow = (10 * np.exp(-((np.arange(288) % 144 - 12) ** 2) / 50)).tolist()
+    seconds = np.arange(288) * 300.0
+    depth = (30 * np.exp(-seconds / 20000) + 1).tolist()
+
+    flows = {
+        "inflow1": {"datetime": datetimes, "flow": flow, "time_unit": "L/s"},
+        "outflow": {"datetime": datetimes, "flow": flow, "time_unit": "L/s"},
+    }
+    return {
+        "/api/rain": {"rain": {"datetime": datetimes, "rain": rain}},
+        "/api/flow": flows,
+        "/api/rainflow": {"rain": {"datetime": datetimes, "rain": rain}, **flows},
+        "/api/infiltration": {
+            "data": [{"datetime": x, "PZ1": y} for x, y in zip(datetimes, depth)],
+            "SMOOTHING_WINDOW": 15,
+            "REGRESSION_WINDOW": 120,
+            "REGRESSION_THRESHOLD": 0.9,
+        },
+    }
+
+
+def warm_up(app):
+    # meant to be called in a pre-fork server's parent process (see
+    # gunicorn_prefork.py). running a request through each endpoint imports the
+    # lazily loaded modules (scipy) and fills pandas/numpy's internal caches, so
+    # forked workers start with all of that already in memory and share the
+    # pages copy-on-write instead of each paying for it on their first request
+    # returns the elapsed time and {path: status code} of any failed requests
+    start = time.perf_counter()
+    client = app.test_client()
+    failed = {}
+    # the endpoints print a lot of debugging output, which isn't useful here
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path, payload in make_warmup_payloads().items():
+            response = client.post(path, json=payload)
+            if response.status_code != 200:
+                failed[path] = response.status_code
+
+    # move everything allocated so far out of the garbage collector's reach, so
+    # collections in the workers don't write to (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    return time.perf_counter() - start, failed